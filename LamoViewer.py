@@ -10,15 +10,51 @@ import os
 import struct
 import json
 import zlib
+import mmap
+import hashlib
+import collections
+import concurrent.futures
 from io import BytesIO
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog, ttk
-from PIL import Image, ImageTk, ImageFile
+from PIL import Image, ImageTk, ImageFile, features
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from base64 import urlsafe_b64encode, urlsafe_b64decode
 
+# parser de JSON: orjson (SIMD, aceita bytes direto) quando disponível
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads  # também aceita bytes; só é mais lento
+
+# backend de inflate: ISA-L (isal) é 2-4x mais rápido que o zlib de
+# referência (Huffman vetorizado + checksums SIMD); API compatível
+try:
+    from isal import isal_zlib as _zlib
+except ImportError:
+    _zlib = zlib
+
+# zstd (opcional): o conversor pode gravar o payload com compression=zstd
+try:
+    import zstandard as _zstd
+except ImportError:
+    _zstd = None
+
+# msgpack (opcional): conversores mais novos podem gravar os metadados em
+# msgpack em vez de JSON
+try:
+    import msgpack as _msgpack
+except ImportError:
+    _msgpack = None
+
+# crc32c (opcional): o conversor pode gravar um CRC32C do payload nos
+# metadados; com o pacote instalado a leitura verifica a integridade
+try:
+    import crc32c as _crc32c
+except ImportError:
+    _crc32c = None
+
 # --- Configurações de Segurança ---
 # VULN-03: Limita o número máximo de pixels para evitar ataques de exaustão de memória (DoS)
 # 178956970 pixels é o limite padrão do Pillow (aprox. 178.9 MP)
@@ -27,75 +63,206 @@ MAX_META_SIZE = 1024 * 1024  # 1MB para metadados JSON (VULN-02)
 MAX_DECOMPRESSED_SIZE = 100 * 1024 * 1024  # 100MB para dados de imagem (VULN-01)
 
 MAGIC = b'LMGO'
-VERSION = 1
+VERSION = 2  # v2: cifra AES-GCM opcional; v1 (Fernet) segue suportado na leitura
+
+# structs pré-compilados do cabeçalho: uma leitura/unpack só em vez de três
+_HDR = struct.Struct('!4sBI')  # magic + versão + tamanho dos metadados
+_U32 = struct.Struct('!I')
 
 # --- funções de criptografia ---
 def derive_key(password: str, salt: bytes) -> bytes:
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=480000, # Recomendado pelo OWASP
-    )
-    key = urlsafe_b64encode(kdf.derive(password.encode()))
-    return key
+    # hashlib.pbkdf2_hmac chama o PKCS5_PBKDF2_HMAC do OpenSSL diretamente,
+    # que usa as instruções SHA (SHA-NI / ARMv8) quando disponíveis.
+    # Retorna os 32 bytes crus; o base64 que o Fernet exige é aplicado uma
+    # única vez na construção (em _get_fernet), não a cada derivação.
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 480000, dklen=32) # Iterações recomendadas pelo OWASP
+
+# Cache de cifras por (algoritmo, salt, hash da senha) — evita repetir as
+# 480k iterações do PBKDF2 ao abrir várias imagens com a mesma senha.
+# Só o hash da senha fica em memória; nada é gravado em disco.
+_CIPHER_CACHE = {}
+_CIPHER_CACHE_MAX = 8
+
+def _get_cipher(kind: str, password: str, salt: bytes):
+    pw_hash = hashlib.sha256(password.encode()).digest()
+    cache_key = (kind, salt, pw_hash)
+    c = _CIPHER_CACHE.get(cache_key)
+    if c is None:
+        raw = derive_key(password, salt)
+        if kind == 'aesgcm':
+            c = AESGCM(raw)
+        else:
+            c = Fernet(urlsafe_b64encode(raw))
+        if len(_CIPHER_CACHE) >= _CIPHER_CACHE_MAX:
+            _CIPHER_CACHE.pop(next(iter(_CIPHER_CACHE)))
+        _CIPHER_CACHE[cache_key] = c
+    return c
+
+def clear_key_cache():
+    _CIPHER_CACHE.clear()
 
 def decrypt_data(data: bytes, password: str, salt: bytes) -> bytes:
-    key = derive_key(password, salt)
-    f = Fernet(key)
-    return f.decrypt(data)
+    return _get_cipher('fernet', password, salt).decrypt(data)
+
+def _parse_meta(raw: bytes) -> dict:
+    # JSON de objeto sempre começa com '{' (0x7b); um mapa msgpack nunca —
+    # dá para distinguir os dois formatos pelo primeiro byte
+    if raw[:1] == b'{':
+        return _json_loads(raw)
+    if _msgpack is None:
+        raise ValueError("Metadados em msgpack; instale o pacote 'msgpack'")
+    return _msgpack.unpackb(raw, raw=False)
+
+def _inflate(compressed, usize: int = 0, wbits: int = zlib.MAX_WBITS) -> bytes:
+    # VULN-01: descompressão com limite de tamanho. Se o escritor gravou
+    # 'uncompressed_size' nos metadados, o buffer de saída é pré-alocado de
+    # uma vez — sem realocações de crescimento nem páginas frias extras.
+    dobj = _zlib.decompressobj(wbits)
+    if 0 < usize <= MAX_DECOMPRESSED_SIZE:
+        out = bytearray(usize)
+        mv = memoryview(out)
+        off = 0
+        data = compressed
+        while data:
+            piece = dobj.decompress(data, 1 << 20)
+            if off + len(piece) > usize:
+                raise ValueError('Tamanho de dados descompactados excedido (Compression Bomb)')
+            mv[off:off + len(piece)] = piece
+            off += len(piece)
+            data = dobj.unconsumed_tail
+        tail = dobj.flush()
+        if tail:
+            if off + len(tail) > usize:
+                raise ValueError('Tamanho de dados descompactados excedido (Compression Bomb)')
+            mv[off:off + len(tail)] = tail
+            off += len(tail)
+        if off != usize:
+            raise ValueError('uncompressed_size inconsistente com o payload')
+        return bytes(out)
+
+    # sem dica de tamanho: bytearray crescendo em blocos grandes
+    out = bytearray()
+    total = 0
+    data = compressed
+    while data:
+        piece = dobj.decompress(data, 1 << 20)
+        total += len(piece)
+        if total > MAX_DECOMPRESSED_SIZE:
+            raise ValueError('Tamanho de dados descompactados excedido (Compression Bomb)')
+        out.extend(piece)
+        data = dobj.unconsumed_tail
+
+    out.extend(dobj.flush())
+    return bytes(out)
 
 # --- leitura do formato .lamo ---
 def read_lamo(path: str, parent=None):
     with open(path, 'rb') as f:
-        magic = f.read(4)
+        hdr = f.read(_HDR.size)
+        if len(hdr) < _HDR.size:
+            raise ValueError('Formato não reconhecido')
+        magic, version, meta_len = _HDR.unpack(hdr)
         if magic != MAGIC:
             raise ValueError('Formato não reconhecido')
-        version = struct.unpack('!B', f.read(1))[0]
-        if version != VERSION:
+        if version not in (1, VERSION):
             raise ValueError(f'Versão incompatível: {version}')
 
         # VULN-02: Checagem de tamanho para metadados JSON
-        meta_len = struct.unpack('!I', f.read(4))[0]
         if meta_len > MAX_META_SIZE:
             raise ValueError(f'Tamanho de metadados excedido: {meta_len} bytes')
 
-        meta_json = f.read(meta_len).decode('utf-8')
-        metadata = json.loads(meta_json)
+        # passa os bytes direto ao parser — sem o str intermediário do decode
+        metadata = _parse_meta(f.read(meta_len))
 
         # VULN-01: Checagem de tamanho para dados comprimidos
-        data_len = struct.unpack('!I', f.read(4))[0]
+        (data_len,) = _U32.unpack(f.read(4))
         if data_len > MAX_DECOMPRESSED_SIZE: # Usando o mesmo limite como um proxy
             raise ValueError(f'Tamanho de dados comprimidos excedido: {data_len} bytes')
 
-        compressed = f.read(data_len)
-
-        # --- Descriptografia (se necessário) ---
+        # --- Leitura do payload ---
+        mm = None
+        mview = None
         if metadata.get("encrypted"):
-            password = simpledialog.askstring("Senha", "O arquivo .lamo está criptografado. Digite a senha:", show='*', parent=parent)
-            if not password:
-                raise ValueError("Operação cancelada. Senha necessária para descriptografar.")
-            
-            salt = urlsafe_b64decode(metadata.get("salt").encode('utf-8'))
-            
+            # as cifras precisam de bytes contíguos; lê direto para o heap
+            compressed = f.read(data_len)
+        else:
+            # mmap: o kernel pagina o arquivo sob demanda direto do page
+            # cache, sem copiar o payload inteiro para o heap
+            offset = f.tell()
             try:
-                compressed = decrypt_data(compressed, password, salt)
-            except Exception as e:
-                raise ValueError(f"Falha na descriptografia. Senha incorreta ou arquivo corrompido: {e}")
-
-        # VULN-01: Descompressão segura com limite de tamanho
-        dobj = zlib.decompressobj()
-        png_bytes = b''
-        decompressed_size = 0
-
-        # Descomprime em blocos para checar o tamanho total
-        for chunk in [compressed[i:i + 1024] for i in range(0, len(compressed), 1024)]:
-            png_bytes += dobj.decompress(chunk)
-            decompressed_size = len(png_bytes)
-            if decompressed_size > MAX_DECOMPRESSED_SIZE:
-                raise ValueError('Tamanho de dados descompactados excedido (Compression Bomb)')
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                mview = memoryview(mm)[offset:offset + data_len]
+                compressed = mview
+            except (ValueError, OSError):
+                compressed = f.read(data_len)
 
-        png_bytes += dobj.flush()
+        try:
+            # --- Descriptografia (se necessário) ---
+            if metadata.get("encrypted"):
+                password = simpledialog.askstring("Senha", "O arquivo .lamo está criptografado. Digite a senha:", show='*', parent=parent)
+                if not password:
+                    raise ValueError("Operação cancelada. Senha necessária para descriptografar.")
+
+                salt = urlsafe_b64decode(metadata.get("salt").encode('utf-8'))
+
+                try:
+                    if metadata.get("cipher") == "AESGCM":
+                        # v2: AES-256-GCM — um passe só, acelerado por AES-NI/PCLMUL
+                        nonce = urlsafe_b64decode(metadata.get("nonce").encode('utf-8'))
+                        compressed = _get_cipher('aesgcm', password, salt).decrypt(nonce, compressed, None)
+                    else:
+                        # v1: Fernet (AES-CBC + HMAC)
+                        compressed = decrypt_data(compressed, password, salt)
+                except Exception as e:
+                    raise ValueError(f"Falha na descriptografia. Senha incorreta ou arquivo corrompido: {e}")
+
+            if metadata.get("compression") == "none":
+                # v2: o payload já é o PNG em si (o IDAT já é deflate);
+                # o zlib externo era redundante e foi omitido na escrita
+                if len(compressed) > MAX_DECOMPRESSED_SIZE:
+                    raise ValueError('Tamanho de dados excedido')
+                png_bytes = bytes(compressed)
+            elif metadata.get("compression") == "zstd":
+                if _zstd is None:
+                    raise ValueError("Arquivo usa compressão zstd; instale o pacote 'zstandard'")
+                # max_output_size explícito: o frame pode não declarar o
+                # tamanho final, e de quebra vira o limite anti-bomba
+                png_bytes = _zstd.ZstdDecompressor().decompress(
+                    bytes(compressed), max_output_size=MAX_DECOMPRESSED_SIZE)
+            else:
+                # v2 pode embrulhar o payload em gzip em vez de zlib: o CRC32
+                # do gzip tem caminho de hardware (SSE4.2/ARMv8) em libz
+                # otimizadas, ao contrário do Adler-32 do zlib
+                wbits = 16 + zlib.MAX_WBITS if metadata.get('container') == 'gzip' else zlib.MAX_WBITS
+                png_bytes = _inflate(compressed, int(metadata.get('uncompressed_size', 0) or 0), wbits)
+        finally:
+            if mview is not None:
+                mview.release()
+            if mm is not None:
+                mm.close()
+
+    # verificação de integridade ponta-a-ponta (CRC32C em hardware; só roda
+    # quando escritor e leitor têm o pacote)
+    if _crc32c is not None and metadata.get("crc32c") is not None:
+        if _crc32c.crc32c(png_bytes) != metadata["crc32c"]:
+            raise ValueError('Falha de integridade: CRC32C do payload não confere')
+
+    if metadata.get("storage") == "raw":
+        # v2: pixels crus — reconstruir é um memcpy, sem passar pelo
+        # decodificador PNG (que faria mais um passe de zlib + filtros)
+        w, h = int(metadata["width"]), int(metadata["height"])
+        if w * h > ImageFile.MAX_IMAGE_PIXELS:
+            raise ValueError('Dimensões excedem o limite de pixels')
+        mode = metadata["mode"]
+        if metadata.get("layout") == "planar":
+            # canais gravados separados (R|G|B|A); remonta com merge
+            bands = Image.getmodebands(mode)
+            plane = w * h
+            img = Image.merge(mode, [Image.frombytes('L', (w, h), png_bytes[i * plane:(i + 1) * plane])
+                                     for i in range(bands)])
+        else:
+            img = Image.frombytes(mode, (w, h), png_bytes)
+        return img, metadata
 
     bio = BytesIO(png_bytes)
     img = Image.open(bio)
@@ -147,12 +314,26 @@ class LamoViewer(tk.Tk):
         self.fit = True
         self.slideshow_running = False
         self.slideshow_delay = 3000  # ms
+        self._resize_job = None       # debounce de <Configure>
+        self._last_sig = None         # assinatura (geometria+zoom+imagem) do último render
+
+        # decode em background + prefetch dos vizinhos (navegação fluida)
+        self._decode_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self._cache = collections.OrderedDict()  # path -> PIL.Image (LRU)
+        self._cache_max = 4
+        self._header_cache = {}  # path -> ((w, h), formato), só do cabeçalho
+        self._pyramid = []       # níveis reduzidos da imagem atual (grande -> pequeno)
 
         # UI
         # O canvas deve usar a cor de fundo escura
         self.canvas = tk.Canvas(self, bg=DARK_BG, highlightthickness=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
 
+        # item de imagem criado uma única vez; _refresh só atualiza coords/conteúdo
+        self._img_item = self.canvas.create_image(0, 0, anchor='center', tags='IMG')
+        # pool de PhotoImages reutilizáveis (evita alocar um pixmap novo por frame)
+        self._photo_pool = []
+
         # binds
         self.bind('<Right>', lambda e: self.next_image())
         self.bind('<Left>', lambda e: self.prev_image())
@@ -161,7 +342,7 @@ class LamoViewer(tk.Tk):
         self.bind('<space>', lambda e: self.toggle_slideshow())
         self.bind('<plus>', lambda e: self.set_zoom(self.zoom * 1.25))
         self.bind('<minus>', lambda e: self.set_zoom(self.zoom / 1.25))
-        self.bind('<Configure>', lambda e: self._refresh())
+        self.bind('<Configure>', lambda e: self._schedule_refresh())
         self.canvas.bind('<MouseWheel>', self._on_mousewheel)
         self.canvas.bind('<Button-1>', lambda e: self.toggle_ui())
 
@@ -196,6 +377,14 @@ class LamoViewer(tk.Tk):
         # inicial
         self.update_info('Pronto — abra um .lamo ou uma pasta')
 
+        # avisa se o Pillow não está linkado ao libjpeg-turbo (decode de JPEG
+        # fica 2-6x mais lento sem ele; veja o README para reinstalar)
+        try:
+            if not features.check_feature('libjpeg_turbo'):
+                print('Aviso: Pillow sem libjpeg-turbo — decode de JPEG usará o caminho lento')
+        except Exception:
+            pass  # versões antigas do Pillow não expõem essa feature
+
     def update_info(self, text: str):
         self.info_var.set(text)
         self.canvas.itemconfig(self.info_text, text=text)
@@ -227,50 +416,220 @@ class LamoViewer(tk.Tk):
             return
         self.files = files
         self.index = 0
+        # valida e guarda dimensões lendo só os cabeçalhos (sem decodificar pixels)
+        for p in files:
+            if p not in self._header_cache:
+                self._decode_pool.submit(self._probe_header, p)
         self.load_current()
 
+    def _probe_header(self, path):
+        # Image.open sem .load() lê apenas o cabeçalho; para .lamo lemos
+        # só magic + versão + metadados, nunca o payload comprimido
+        try:
+            if path.lower().endswith('.lamo'):
+                with open(path, 'rb') as f:
+                    hdr = f.read(_HDR.size)
+                    if len(hdr) < _HDR.size:
+                        return
+                    magic, version, meta_len = _HDR.unpack(hdr)
+                    if magic != MAGIC or meta_len > MAX_META_SIZE:
+                        return
+                    meta = _parse_meta(f.read(meta_len))
+                    self._header_cache[path] = ((meta.get('width'), meta.get('height')), 'LAMO')
+            else:
+                with Image.open(path) as im:
+                    self._header_cache[path] = (im.size, im.format)
+        except Exception:
+            pass  # arquivo inválido; o erro aparece quando o usuário abrir
+
+    @staticmethod
+    def _decode(path: str, draft_size=None) -> Image.Image:
+        # VULN-03: ImageFile.MAX_IMAGE_PIXELS já está configurado globalmente
+        pil = Image.open(path)
+        if draft_size and pil.format == 'JPEG':
+            # draft() faz o libjpeg decodificar direto em 1/2, 1/4 ou 1/8
+            # da resolução (pula a maior parte do IDCT); pedimos 2x o
+            # canvas para o LANCZOS final ainda ter folga
+            pil.draft('RGB', draft_size)
+        pil.load()
+        return pil
+
+    def _draft_size(self):
+        cw = max(self.canvas.winfo_width(), 1)
+        ch = max(self.canvas.winfo_height(), 1)
+        return (cw * 2, ch * 2)
+
     def load_current(self):
         if not (0 <= self.index < len(self.files)):
             return
         path = self.files[self.index]
-        try:
-            if path.lower().endswith('.lamo'):
+        # .lamo pode pedir senha (diálogo Tk), então decodifica na thread principal
+        if path.lower().endswith('.lamo'):
+            try:
                 pil, meta = read_lamo(path, parent=self)
-            else:
-                # VULN-03: ImageFile.MAX_IMAGE_PIXELS já está configurado globalmente
-                pil = Image.open(path)
-                pil.load()
-            self.pil_image = pil
-            self.zoom = 1.0
-            self.fit = True
-            self._refresh()
-            self.update_info(f'[{self.index+1}/{len(self.files)}] {os.path.basename(path)} — {pil.width}x{pil.height}')
+            except Exception as e:
+                # VULN-04: Tratamento de erro seguro - não expõe detalhes internos da exceção
+                print(f"Erro ao carregar {path}: {e}") # Log interno para debug
+                messagebox.showerror('Erro', 'Falha ao abrir o arquivo. O arquivo pode estar corrompido ou o formato não é suportado.')
+                return
+            self._show_image(path, pil)
+            return
+        # imagem comum: usa o cache se já decodificada, senão decodifica no worker
+        if path in self._cache:
+            self._cache.move_to_end(path)
+            self._show_image(path, self._cache[path])
+            self._prefetch()
+            return
+        # cabeçalho sondado ao abrir a pasta: nome e dimensões aparecem na
+        # hora, enquanto o decode de verdade roda no worker
+        probed = self._header_cache.get(path)
+        if probed and probed[0][0] and probed[0][1]:
+            (w, h), _fmt = probed
+            self.update_info(f'[{self.index+1}/{len(self.files)}] {os.path.basename(path)} — {w}x{h} (carregando...)')
+        fut = self._decode_pool.submit(self._decode, path, self._draft_size())
+        self.after(20, self._poll_future, path, fut)
+
+    def _poll_future(self, path, fut):
+        # checa a conclusão sem bloquear o loop de eventos
+        if not fut.done():
+            self.after(20, self._poll_future, path, fut)
+            return
+        try:
+            pil = fut.result()
         except Exception as e:
             # VULN-04: Tratamento de erro seguro - não expõe detalhes internos da exceção
             print(f"Erro ao carregar {path}: {e}") # Log interno para debug
             messagebox.showerror('Erro', 'Falha ao abrir o arquivo. O arquivo pode estar corrompido ou o formato não é suportado.')
+            return
+        self._cache_put(path, pil)
+        # só pinta se o usuário ainda está nesse arquivo
+        if self.files and 0 <= self.index < len(self.files) and self.files[self.index] == path:
+            self._show_image(path, pil)
+            self._prefetch()
+
+    def _show_image(self, path, pil):
+        self.pil_image = pil
+        self._build_pyramid()
+        self.zoom = 1.0
+        self.fit = True
+        self._last_sig = None
+        self._refresh()
+        self.update_info(f'[{self.index+1}/{len(self.files)}] {os.path.basename(path)} — {pil.width}x{pil.height}')
+
+    def _cache_put(self, path, pil):
+        self._cache[path] = pil
+        self._cache.move_to_end(path)
+        while len(self._cache) > self._cache_max:
+            self._cache.popitem(last=False)
+
+    def _prefetch(self):
+        # decodifica os vizinhos (próxima/anterior) em background
+        n = len(self.files)
+        if n < 2:
+            return
+        for i in ((self.index + 1) % n, (self.index - 1) % n):
+            p = self.files[i]
+            if p in self._cache or p.lower().endswith('.lamo'):
+                continue
+            fut = self._decode_pool.submit(self._decode, p, self._draft_size())
+            fut.add_done_callback(lambda f, p=p: self._on_prefetch(p, f))
+
+    def _on_prefetch(self, path, fut):
+        # roda na thread do worker; devolve o resultado para a thread principal
+        try:
+            pil = fut.result()
+        except Exception:
+            return  # prefetch é oportunista; o erro reaparece no load normal
+        self.after(0, self._cache_put, path, pil)
+
+    def _schedule_refresh(self):
+        # <Configure> dispara a cada pixel de redimensionamento; agrupa
+        # vários eventos em um único _refresh
+        if self._resize_job:
+            self.after_cancel(self._resize_job)
+        self._resize_job = self.after(50, self._refresh)
+
+    def _build_pyramid(self):
+        # Para imagens muito maiores que a tela, guarda versões reduzidas
+        # (1/2, 1/4, 1/8) — o _refresh reamostra a partir da menor que
+        # ainda cobre o alvo, em vez de reler os pixels todos a cada vez
+        pil = self.pil_image
+        self._pyramid = [pil]
+        cw = max(self.canvas.winfo_width(), 1)
+        ch = max(self.canvas.winfo_height(), 1)
+        if pil.width * pil.height <= 4 * cw * ch:
+            return
+        im = pil
+        for _ in range(3):
+            if im.width < 2 * cw or im.height < 2 * ch:
+                break
+            im = im.resize((max(1, im.width // 2), max(1, im.height // 2)), Image.BOX)
+            self._pyramid.append(im)
+
+    def _resample(self, src: Image.Image, tw: int, th: int) -> Image.Image:
+        # escolhe o menor nível da pirâmide que ainda cobre o alvo
+        if src is self.pil_image and self._pyramid:
+            for im in reversed(self._pyramid):
+                if im.width >= tw and im.height >= th:
+                    src = im
+                    break
+        # Para reduções grandes (>3x), Image.reduce(n) faz uma média de blocos
+        # por fator inteiro — bem mais barata que um resize fracionário e
+        # corta ~n² dos bytes lidos; o LANCZOS final refina.
+        # Com Pillow-SIMD instalado (pip install pillow-simd), os kernels
+        # são vetorizados (SSE4/AVX2) sem mudança de API.
+        ratio = max(src.width / tw, src.height / th)
+        if ratio > 3:
+            factor = max(2, int(ratio // 2))
+            src = src.reduce(factor)
+        return src.resize((tw, th), Image.LANCZOS)
+
+    def _get_photo(self, img: Image.Image) -> ImageTk.PhotoImage:
+        # reaproveita um PhotoImage do pool via paste() quando o tamanho/modo
+        # bate — sem round-trip ao servidor X para alocar pixmap novo
+        key = (img.width, img.height, img.mode)
+        for ph, pkey in self._photo_pool:
+            if pkey == key:
+                ph.paste(img)
+                return ph
+        ph = ImageTk.PhotoImage(img)
+        self._photo_pool.append((ph, key))
+        if len(self._photo_pool) > 2:
+            self._photo_pool.pop(0)
+        return ph
+
+    def _paint(self, img: Image.Image, cw: int, ch: int):
+        self.tk_image = self._get_photo(img)
+        self.canvas.coords(self._img_item, cw // 2, ch // 2)
+        self.canvas.itemconfig(self._img_item, image=self.tk_image)
 
     def _refresh(self):
+        self._resize_job = None
         if not self.pil_image:
-            self.canvas.delete('IMG')
+            self.canvas.itemconfig(self._img_item, image='')
             return
         cw = self.canvas.winfo_width()
         ch = self.canvas.winfo_height()
+        # early-out: <Configure> também dispara em foco/entrada do mouse com a
+        # mesma geometria — não reamostra se nada que afeta o render mudou
+        sig = (cw, ch, self.zoom, self.fit, id(self.pil_image))
+        if sig == self._last_sig:
+            return
+        self._last_sig = sig
         if self.fit:
-            # escala para caber na tela
-            img = self.pil_image.copy()
-            img.thumbnail((cw, ch), Image.LANCZOS)
-            self.tk_image = ImageTk.PhotoImage(img)
-            self.canvas.delete('IMG')
-            self.canvas.create_image(cw//2, ch//2, image=self.tk_image, anchor='center', tags='IMG')
+            # escala para caber na tela — resize direto evita a cópia
+            # integral que copy()+thumbnail() fazia a cada evento
+            scale = min(cw / self.pil_image.width, ch / self.pil_image.height, 1.0)
+            tw = max(1, int(self.pil_image.width * scale))
+            th = max(1, int(self.pil_image.height * scale))
+            img = self._resample(self.pil_image, tw, th)
+            self._paint(img, cw, ch)
         else:
             # aplica zoom
             w = int(self.pil_image.width * self.zoom)
             h = int(self.pil_image.height * self.zoom)
-            img = self.pil_image.resize((max(1,w), max(1,h)), Image.LANCZOS)
-            self.tk_image = ImageTk.PhotoImage(img)
-            self.canvas.delete('IMG')
-            self.canvas.create_image(cw//2, ch//2, image=self.tk_image, anchor='center', tags='IMG')
+            img = self._resample(self.pil_image, max(1, w), max(1, h))
+            self._paint(img, cw, ch)
 
     def next_image(self):
         if not self.files:
@@ -292,6 +651,7 @@ class LamoViewer(tk.Tk):
 
     def toggle_fit(self):
         self.fit = not self.fit
+        self._last_sig = None
         self._refresh()
         self.update_info('Ajustar à janela' if self.fit else 'Zoom livre')
 
@@ -332,4 +692,7 @@ class LamoViewer(tk.Tk):
 
 if __name__ == '__main__':
     app = LamoViewer()
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        clear_key_cache()  # higiene: não mantém chaves derivadas após sair
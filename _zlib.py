@@ -0,0 +1,24 @@
+"""
+Backend de zlib para o LamoImage.
+
+Tenta, nesta ordem:
+
+1. zlib-ng (pacote PyPI 'zlib-ng') — mesmas chamadas compress/decompress
+   aceleradas com SIMD (chunkcopy vetorizado, adler32/CRC32 em
+   AVX2/SSE4.2);
+2. ISA-L (pacote 'isal') — Huffman vetorizado e checksums SIMD, 2-4x o
+   zlib de referência no inflate;
+3. zlib da stdlib, sempre presente.
+
+A API é compatível entre os três: compress, decompress, compressobj,
+decompressobj e as constantes (MAX_WBITS etc.).
+
+Uso: `from _zlib import zlib`
+"""
+try:
+    from zlib_ng import zlib_ng as zlib
+except ImportError:
+    try:
+        from isal import isal_zlib as zlib
+    except ImportError:
+        import zlib
@@ -9,19 +9,79 @@ DARK_FG = '#ffffff'
 DARK_ACTIVE = '#4a4a4a'
 DARK_BORDER = '#1e1e1e'
 
+import sys
 import json
-import zlib
 import struct
 import os
+import mmap
+import hashlib
+import functools
+import concurrent.futures
 from io import BytesIO
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, simpledialog
-from PIL import Image, ImageTk, ImageFile
+from PIL import Image, ImageTk, ImageFile, features
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from base64 import urlsafe_b64encode, urlsafe_b64decode
 
+# zlib-ng quando instalado, senão o zlib da stdlib (mesma API)
+from _zlib import zlib
+
+# JSON de metadados: orjson (SIMD, trabalha com bytes direto) quando disponível
+try:
+    from orjson import loads as _json_loads, dumps as _json_dumps
+except ImportError:
+    _json_loads = json.loads  # também aceita bytes; só é mais lento
+    def _json_dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+# numpy (opcional) acelera a conversão interleaved <-> planar do storage raw
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+# backend de deflate: libdeflate (pacote 'libdeflate') tem adler32/CRC32
+# SIMD e chunkcopy vetorizado — bem mais rápido que o zlib de referência.
+# Opcional; sem ele tudo cai no zlib da stdlib.
+try:
+    import libdeflate as _libdeflate
+except ImportError:
+    _libdeflate = None
+
+# zstd (pacote 'zstandard'): no nível 3 comprime parecido com zlib-6 a
+# 3-5x a velocidade, e descomprime ~4x mais rápido. Opcional; sem ele os
+# arquivos novos continuam saindo em zlib.
+try:
+    import zstandard as _zstd
+except ImportError:
+    _zstd = None
+
+# msgpack (opcional): serializa os metadados ~5-10x mais rápido que JSON e
+# sem re-encode UTF-8. Os leitores distinguem pelo primeiro byte ('{' = JSON).
+try:
+    import msgpack as _msgpack
+except ImportError:
+    _msgpack = None
+
+# pyspng (opcional): encoder PNG em C bem mais rápido que o do Pillow para
+# RGB(A)/L 8-bit; a saída continua sendo PNG padrão. As builds publicadas
+# até a 0.1.4 só trazem load() — sem encode(), trata como indisponível.
+try:
+    import pyspng as _pyspng
+    if not hasattr(_pyspng, "encode"):
+        _pyspng = None
+except ImportError:
+    _pyspng = None
+
+# crc32c (opcional): checksum com instrução de hardware (SSE4.2/ARMv8),
+# custo praticamente nulo — dá verificação de integridade ponta-a-ponta
+try:
+    import crc32c as _crc32c
+except ImportError:
+    _crc32c = None
+
 # --- Configurações de Segurança ---
 # VULN-02: Limita o número máximo de pixels para evitar ataques de exaustão de memória (DoS)
 ImageFile.MAX_IMAGE_PIXELS = 178956970
@@ -30,148 +90,526 @@ MAX_DECOMPRESSED_SIZE = 100 * 1024 * 1024  # 100MB para dados de imagem (VULN-01
 
 # --- formato ---
 MAGIC = b'LMGO'
-VERSION = 1
+VERSION = 2  # v2: storage 'raw' (pixels crus); v1 segue suportado na leitura
+
+# structs pré-compilados do cabeçalho (evita reparsear o format string
+# e permite escrever/ler o prefixo fixo de uma vez)
+_PREFIX = struct.Struct('!4sBI')  # magic + versão + tamanho dos metadados
+_U32 = struct.Struct('!I')
 
 # --- funções de criptografia ---
+@functools.lru_cache(maxsize=16)
 def derive_key(password: str, salt: bytes) -> bytes:
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=480000, # Recomendado pelo OWASP
-    )
-    key = urlsafe_b64encode(kdf.derive(password.encode()))
-    return key
-
-def encrypt_data(data: bytes, password: str, salt: bytes) -> bytes:
-    key = derive_key(password, salt)
-    f = Fernet(key)
-    return f.encrypt(data)
-
-def decrypt_data(data: bytes, password: str, salt: bytes) -> bytes:
-    key = derive_key(password, salt)
-    f = Fernet(key)
-    return f.decrypt(data)
+    # hashlib.pbkdf2_hmac chama o PKCS5_PBKDF2_HMAC do OpenSSL, que usa as
+    # instruções SHA (SHA-NI / ARMv8) quando o libcrypto tem suporte.
+    # O lru_cache evita repetir as 480k iterações quando o mesmo par
+    # senha+salt é usado de novo (ex.: reabrir o arquivo recém-salvo).
+    # Retorna os 32 bytes crus; AESGCM usa a chave direto e o base64 que o
+    # Fernet (leitura de v1) exige é aplicado no ponto de uso.
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 480000, dklen=32) # Iterações recomendadas pelo OWASP
+
+# Instâncias de cifra memoizadas: num lote com a mesma senha+salt, o KDF e a
+# construção da cifra acontecem uma vez, não por arquivo
+@functools.lru_cache(maxsize=16)
+def _aesgcm(password: str, salt: bytes) -> AESGCM:
+    return AESGCM(derive_key(password, salt))
+
+@functools.lru_cache(maxsize=16)
+def _fernet(password: str, salt: bytes) -> Fernet:
+    return Fernet(urlsafe_b64encode(derive_key(password, salt)))
+
+def encrypt_data(data: bytes, password: str, salt: bytes, nonce: bytes) -> bytes:
+    # AES-256-GCM: um passe só sobre os dados (AES-NI + GHASH por PCLMUL),
+    # contra os dois passes do Fernet (AES-CBC + HMAC-SHA256)
+    return _aesgcm(password, salt).encrypt(nonce, data, None)
+
+def decrypt_data(data: bytes, password: str, salt: bytes, nonce: bytes = None) -> bytes:
+    if nonce is None:
+        # arquivo v1: Fernet (AES-CBC + HMAC)
+        return _fernet(password, salt).decrypt(data)
+    return _aesgcm(password, salt).decrypt(nonce, data, None)
 
 # --- funções de I/O do formato LAMO ---
 def image_to_png_bytes(img: Image.Image, quality: int = 95) -> bytes:
-    bio = BytesIO()
-    # Salvamos o conteúdo interno como PNG (formato do payload)
-    # A compressão PNG é lossless, mas a qualidade do JPEG/WEBP original é mantida
-    # O parâmetro 'compress_level' do PNG controla a compressão, mas não a qualidade visual.
-    # Para simular o controle de qualidade, vamos salvar como JPEG temporariamente se a qualidade for menor que 95,
-    # e depois converter para PNG. Isso é uma simplificação, mas funciona para o propósito.
-    # No entanto, o formato LAMO usa PNG comprimido com zlib, que é lossless.
-    # Para controlar a "qualidade" da imagem final, o melhor é controlar a qualidade da imagem ANTES de salvar como PNG.
-    # Como o objetivo é controlar a compressão, vamos usar o compress_level do PNG.
-    # Mas para o usuário, "qualidade" é mais intuitivo. Vamos manter o PNG lossless e usar o zlib_level.
-    
-    # O zlib.compress já usa compressão nível 9 por padrão.
-    # Para dar controle ao usuário, vamos usar o parâmetro 'quality' para o nível de compressão zlib.
-    # No entanto, a função image_to_png_bytes só deve gerar os bytes PNG.
-    # A compressão zlib é feita em write_lamo.
-    
-    # Vamos manter a função image_to_png_bytes simples e lossless.
-    img.save(bio, format='PNG')
+    if _pyspng is not None and _np is not None and img.mode in ("RGB", "RGBA", "L"):
+        # caminho rápido: encode em C direto do array numpy. O resultado é
+        # PNG normal, então nada muda para quem lê.
+        try:
+            return _pyspng.encode(_np.asarray(img), compress_level=1)
+        except Exception as e:
+            print(f"pyspng falhou ({e}); usando o encoder do Pillow")
+    # pré-aloca ~metade dos bytes crus: o encoder despeja multi-MB no
+    # BytesIO, e sem reserva o buffer cresce por realloc geométrico
+    # (várias cópias do conteúdo já escrito). Precisa ser via conteúdo
+    # inicial — truncate(cap) num stream vazio não aloca nada; o write
+    # a partir da posição 0 vai sobrescrevendo a reserva.
+    cap = img.width * img.height * len(img.getbands()) // 2
+    bio = BytesIO(bytes(cap)) if cap > 0 else BytesIO()
+    # O conteúdo interno é PNG (lossless). A compressão de verdade fica com
+    # a camada do container (zlib sobre o payload), então o deflate caro do
+    # próprio PNG é trabalho perdido: nível 1 e sem busca de filtro por
+    # linha cortam o tempo de encode sem mudar o resultado final.
+    img.save(bio, format='PNG', compress_level=1, optimize=False)
+    bio.truncate(bio.tell())  # apara a folga da reserva que não foi usada
     return bio.getvalue()
 
-def write_lamo(path: str, img: Image.Image, metadata: dict = None, password: str = None, zlib_level: int = 9):
-    png_bytes = image_to_png_bytes(img)
-    
-    # Compressão ZLIB com nível ajustável
-    compressed = zlib.compress(png_bytes, level=zlib_level)
+def write_lamo_bytes(path: str, png_bytes: bytes, metadata: dict = None, password: str = None, zlib_level: int = 9, thumb: bytes = None):
+    # Escreve um .lamo a partir de um payload já pronto (bytes PNG ou pixels
+    # crus, conforme meta['storage']) — permite copiar um PNG de entrada
+    # direto para o container sem decodificar/recodificar
+    meta = metadata.copy() if metadata else {}
+    meta.setdefault("inner_format", "PNG")
+    # As chaves de container descrevem ESTA gravação, não a do arquivo de
+    # origem. A GUI devolve a metadata de um .lamo aberto ao reconverter,
+    # então valores herdados aqui estariam simplesmente errados para o
+    # payload novo — sempre sobrescritos/limpos, nunca setdefault.
+    meta["zlib_level"] = zlib_level # Salva o nível de compressão
+    # dica para o leitor pré-alocar o buffer de descompressão
+    meta["uncompressed_size"] = len(png_bytes)
+    meta.pop("container", None)  # só escritores gzip gravam essa chave
+
+    # CRC32C do payload antes do container (cifra/compressão): o leitor
+    # verifica depois de descomprimir, cobrindo o caminho inteiro. Sempre
+    # recalculado — um CRC herdado do arquivo de origem descreveria outro
+    # payload e faria todo leitor rejeitar este
+    if _crc32c is not None:
+        meta["crc32c"] = _crc32c.crc32c(png_bytes)
+    else:
+        meta.pop("crc32c", None)
+
+    # Payload PNG já é deflate por dentro — zlib por cima queima CPU para
+    # ganhar ~0-2%. Grava como está e marca nos metadados; pixels crus
+    # (storage=raw) continuam passando pelo zlib do container.
+    if meta.get("storage") != "raw":
+        meta["compression"] = "none"
+    elif _zstd is not None:
+        meta["compression"] = "zstd"
+    else:
+        meta.pop("compression", None)  # zlib é o default implícito do formato
+
+    # seção opcional de miniatura (v2): u32 tamanho + PNG depois do payload.
+    # Leitores antigos param no fim do payload, então bytes extras não quebram nada.
+    if thumb:
+        meta["thumbnail"] = True
+    else:
+        meta.pop("thumbnail", None)
 
-    salt = None
     if password:
+        # cifra precisa da mensagem inteira: caminho bufferizado
+        if meta.get("compression") == "none":
+            compressed = png_bytes
+        elif meta.get("compression") == "zstd":
+            compressed = _zstd_compressor().compress(png_bytes)
+        # Compressão ZLIB com nível ajustável
+        elif _libdeflate is not None:
+            compressed = _libdeflate.zlib_compress(png_bytes, zlib_level)
+        else:
+            compressed = zlib.compress(png_bytes, level=zlib_level)
+
         salt = os.urandom(16)
-        compressed = encrypt_data(compressed, password, salt)
-        meta.setdefault("encrypted", True)
-        meta.setdefault("salt", urlsafe_b64encode(salt).decode('utf-8'))
+        nonce = os.urandom(12)
+        compressed = encrypt_data(compressed, password, salt, nonce)
+        meta["encrypted"] = True
+        meta["cipher"] = "AESGCM"
+        meta["salt"] = urlsafe_b64encode(salt).decode('utf-8')
+        meta["nonce"] = urlsafe_b64encode(nonce).decode('utf-8')
 
-    meta = metadata.copy() if metadata else {}
-    meta.setdefault("width", img.width)
-    meta.setdefault("height", img.height)
-    meta.setdefault("mode", img.mode)
-    # tenta pegar formato original se existir
-    meta.setdefault("inner_format", getattr(img, "format", "PNG") or "PNG")
-    meta.setdefault("zlib_level", zlib_level) # Salva o nível de compressão
+        meta_json = _meta_json(meta)
+        with open(path, 'wb', buffering=1 << 20) as f:
+            # cabeçalho inteiro em um write só
+            f.write(_PREFIX.pack(MAGIC, VERSION, len(meta_json)) + meta_json + _U32.pack(len(compressed)))
+            f.write(compressed)
+            if thumb:
+                f.write(_U32.pack(len(thumb)) + thumb)
+        return
+
+    # sem criptografia: compressão em streaming direto para o arquivo —
+    # nunca existe um segundo buffer com o payload comprimido inteiro
+    # (pico de memória cai de ~3x para ~1x o payload)
+    # chaves de cifra herdadas de uma origem criptografada fariam os
+    # leitores pedir senha para um arquivo em claro (e falhar ao decifrar)
+    for stale in ("encrypted", "cipher", "salt", "nonce"):
+        meta.pop(stale, None)
+    meta_json = _meta_json(meta)
+    # buffer de 1MB: os chunks do compressor viram poucas syscalls grandes,
+    # que é o que um HDD quer para sustentar escrita sequencial
+    with open(path, 'wb', buffering=1 << 20) as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(meta_json)) + meta_json)
+
+        if meta.get("compression") == "none":
+            f.write(_U32.pack(len(png_bytes)))
+            f.write(png_bytes)
+            if thumb:
+                f.write(_U32.pack(len(thumb)) + thumb)
+            return
+
+        len_pos = f.tell()
+        f.write(_U32.pack(0))  # placeholder; corrigido via seek no fim
+
+        if meta.get("compression") == "zstd":
+            co = _zstd_compressor().compressobj()
+        else:
+            co = zlib.compressobj(zlib_level)
+        mv = memoryview(png_bytes)
+        clen = 0
+        for i in range(0, len(mv), 1 << 20):
+            chunk = co.compress(mv[i:i + (1 << 20)])
+            clen += len(chunk)
+            f.write(chunk)
+        tail = co.flush()
+        clen += len(tail)
+        f.write(tail)
+
+        if thumb:
+            f.write(_U32.pack(len(thumb)) + thumb)
 
-    meta_json = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        f.seek(len_pos)
+        f.write(_U32.pack(clen))
 
+def _zstd_compressor():
+    # threads=-1: um worker por núcleo. O zstd fatia a entrada em jobs e
+    # comprime em paralelo dentro da própria libzstd, mas a saída continua
+    # sendo um frame único — qualquer descompressor normal lê igual.
+    try:
+        return _zstd.ZstdCompressor(level=3, threads=-1)
+    except _zstd.ZstdError:
+        # build sem suporte a multithread
+        return _zstd.ZstdCompressor(level=3)
+
+class _ZlibFileWriter:
+    # File-like mínimo para img.save(): recebe os chunks do encoder PNG e
+    # manda direto para o arquivo do container, opcionalmente passando por um
+    # compressobj no caminho. O PNG inteiro nunca chega a existir em memória.
+    def __init__(self, f, compressor=None):
+        self._f = f
+        self._co = compressor
+        self.written = 0  # bytes que chegaram ao arquivo (pós-compressão)
+
+    def write(self, data):
+        n = len(data)
+        if self._co is not None:
+            data = self._co.compress(data)
+        if data:
+            self._f.write(data)
+            self.written += len(data)
+        return n
+
+    def finish(self):
+        if self._co is not None:
+            tail = self._co.flush()
+            if tail:
+                self._f.write(tail)
+                self.written += len(tail)
+
+def _meta_json(meta: dict) -> bytes:
+    # msgpack quando disponível; senão JSON. O leitor detecta pelo 1º byte.
+    if _msgpack is not None:
+        meta_json = _msgpack.packb(meta)
+    else:
+        meta_json = _json_dumps(meta)
     # VULN-03: Checagem de tamanho para metadados JSON (embora seja gerado internamente, é uma boa prática)
     if len(meta_json) > MAX_META_SIZE:
         raise ValueError(f'Tamanho de metadados gerados excedido: {len(meta_json)} bytes')
+    return meta_json
 
-    with open(path, 'wb') as f:
-        f.write(MAGIC)
-        f.write(struct.pack('!B', VERSION))
-        f.write(struct.pack('!I', len(meta_json)))
-        f.write(meta_json)
-        f.write(struct.pack('!I', len(compressed)))
-        f.write(compressed)
+def _parse_meta(raw: bytes) -> dict:
+    # JSON de objeto sempre começa com '{' (0x7b); um mapa msgpack nunca
+    if raw[:1] == b'{':
+        return _json_loads(raw)
+    if _msgpack is None:
+        raise ValueError("Metadados em msgpack; instale o pacote 'msgpack'")
+    return _msgpack.unpackb(raw, raw=False)
 
-def read_lamo(path: str, parent=None):
+def _thumb_bytes(img: Image.Image, size: int = 512) -> bytes:
+    # miniatura PNG para a seção opcional do container; quem abre o arquivo
+    # vê o preview na hora, sem esperar o decode do payload cheio
+    if max(img.width, img.height) <= size:
+        return None  # a imagem inteira já é pequena; miniatura não ajuda
+    thumb = img.copy()
+    thumb.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+    return image_to_png_bytes(thumb)
+
+def write_lamo(path: str, img: Image.Image, metadata: dict = None, password: str = None, zlib_level: int = 9, storage: str = "raw"):
+    # merge em literal: uma construção só em C, em vez de copy() + três
+    # setdefault interpretados; as chaves do chamador continuam vencendo
+    # (o ** sobrescreve os defaults, como o setdefault fazia)
+    meta = {"width": img.width, "height": img.height, "mode": img.mode,
+            **(metadata or {})}
+
+    # Sem senha, embute a miniatura. Com senha não: uma miniatura em claro
+    # vazaria o conteúdo de um arquivo criptografado.
+    thumb = None if password else _thumb_bytes(img)
+
+    # raw só para modos que o frombytes reconstrói por inteiro. P perderia
+    # a paleta (modo volta, cores não), 1/CMYK/I;16 têm empacotamento
+    # próprio — esses caem no payload PNG, que preserva tudo.
+    if storage == "raw" and img.mode not in ("L", "LA", "RGB", "RGBA"):
+        storage = "png"
+
+    if storage == "raw":
+        # v2: pixels crus + um passe único de zlib. Evita a dupla compressão
+        # (PNG já é deflate por dentro) e o deflate enxerga a redundância
+        # real dos pixels — mais rápido e comprime melhor.
+        meta["storage"] = "raw"
+        meta["inner_format"] = "RAW"
+        meta.pop("layout", None)  # redefinido abaixo conforme o modo atual
+        payload = img.tobytes()
+        if img.mode in ("RGB", "RGBA"):
+            # layout planar (SoA): canais separados em vez de RGBRGB...
+            # O deflate encontra casamentos bem mais longos dentro de um
+            # canal só — tipicamente 5-15% menor e mais rápido de comprimir
+            bands = len(img.getbands())
+            if _np is not None:
+                payload = _np.frombuffer(payload, dtype=_np.uint8).reshape(-1, bands).T.tobytes()
+            else:
+                payload = b''.join(p.tobytes() for p in img.split())
+            meta["layout"] = "planar"
+    else:
+        # compatibilidade: payload PNG como no v1
+        # tenta pegar formato original se existir
+        meta["inner_format"] = getattr(img, "format", "PNG") or "PNG"
+        # chaves do storage raw herdadas de um .lamo de origem não valem
+        # para um payload PNG
+        meta.pop("storage", None)
+        meta.pop("layout", None)
+        if not password:
+            # streaming: o encoder PNG escreve direto no arquivo do container
+            # via _ZlibFileWriter — sem o buffer intermediário do BytesIO.
+            # (Com senha a cifra precisa da mensagem inteira; cai no
+            # caminho bufferizado abaixo.)
+            meta["compression"] = "none"
+            # este caminho não passa por write_lamo_bytes: limpa as mesmas
+            # chaves de container que lá seriam recalculadas (o tamanho do
+            # PNG só existe depois do encode, então a dica fica de fora)
+            meta.pop("container", None)
+            meta.pop("uncompressed_size", None)
+            # sem os bytes do PNG em mãos não há como calcular o CRC aqui;
+            # um valor herdado só serviria para reprovar o arquivo novo
+            meta.pop("crc32c", None)
+            # idem para as chaves de cifra: este caminho só roda sem senha
+            for stale in ("encrypted", "cipher", "salt", "nonce"):
+                meta.pop(stale, None)
+            if thumb:
+                meta["thumbnail"] = True
+            else:
+                meta.pop("thumbnail", None)
+            meta_json = _meta_json(meta)
+            with open(path, 'wb', buffering=1 << 20) as f:
+                f.write(_PREFIX.pack(MAGIC, VERSION, len(meta_json)) + meta_json)
+                len_pos = f.tell()
+                f.write(_U32.pack(0))  # placeholder; corrigido via seek no fim
+                writer = _ZlibFileWriter(f)
+                img.save(writer, format='PNG', compress_level=1, optimize=False)
+                writer.finish()
+                if thumb:
+                    f.write(_U32.pack(len(thumb)) + thumb)
+                f.seek(len_pos)
+                f.write(_U32.pack(writer.written))
+            return
+        payload = image_to_png_bytes(img)
+
+    write_lamo_bytes(path, payload, meta, password, zlib_level, thumb)
+
+def read_lamo_header(path: str):
+    # Valida magic/versão e parseia só os metadados — barato o bastante para
+    # a GUI mostrar dimensões e metadata na hora, sem tocar no payload
     with open(path, 'rb') as f:
-        magic = f.read(4)
+        hdr = f.read(_PREFIX.size)
+        if len(hdr) < _PREFIX.size:
+            raise ValueError("Formato não reconhecido (magic mismatch).")
+        magic, version, meta_len = _PREFIX.unpack(hdr)
         if magic != MAGIC:
             raise ValueError("Formato não reconhecido (magic mismatch).")
-        version = struct.unpack('!B', f.read(1))[0]
-        if version != VERSION:
+        if version not in (1, VERSION):
             raise ValueError(f"Versão incompatível: {version}")
 
         # VULN-03: Checagem de tamanho para metadados JSON
-        meta_len = struct.unpack('!I', f.read(4))[0]
         if meta_len > MAX_META_SIZE:
             raise ValueError(f'Tamanho de metadados excedido: {meta_len} bytes')
 
-        meta_json = f.read(meta_len).decode('utf-8')
-        metadata = json.loads(meta_json)
+        # metadados + tamanho do payload numa leitura só (uma syscall a menos);
+        # bytes direto ao parser, sem o str intermediário do decode
+        blob = f.read(meta_len + 4)
+        if len(blob) < meta_len + 4:
+            raise ValueError("Formato não reconhecido (magic mismatch).")
+        metadata = _parse_meta(blob[:meta_len])
 
         # VULN-01: Checagem de tamanho para dados comprimidos
-        data_len = struct.unpack('!I', f.read(4))[0]
+        (data_len,) = _U32.unpack_from(blob, meta_len)
         if data_len > MAX_DECOMPRESSED_SIZE: # Usando o mesmo limite como um proxy
             raise ValueError(f'Tamanho de dados comprimidos excedido: {data_len} bytes')
 
-        compressed = f.read(data_len)
+        # data_len vem do arquivo — se for maior do que realmente sobra no
+        # disco, falha agora em vez de alocar um buffer gigante e só
+        # descobrir o truncamento no read()
+        remaining = os.fstat(f.fileno()).st_size - f.tell()
+        if data_len > remaining:
+            raise ValueError(f'Arquivo truncado: payload declara {data_len} bytes, restam {remaining}')
 
-        # --- Descriptografia (se necessário) ---
+        return metadata, f.tell(), data_len
+
+def read_lamo_thumb(path: str, metadata: dict, offset: int, data_len: int):
+    # Lê a seção opcional de miniatura (u32 tamanho + PNG, após o payload).
+    # Retorna None se não houver; a miniatura é só conforto visual, então
+    # qualquer problema aqui cai silenciosamente no decode normal.
+    if not metadata.get("thumbnail"):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset + data_len)
+            raw = f.read(4)
+            if len(raw) < 4:
+                return None
+            (tlen,) = _U32.unpack(raw)
+            if not 0 < tlen <= MAX_META_SIZE:
+                return None
+            img = Image.open(BytesIO(f.read(tlen)))
+            img.load()
+            return img
+    except Exception as e:
+        print(f"Miniatura embutida ilegível (ignorada): {e}")
+        return None
+
+def read_lamo_payload(path: str, metadata: dict, offset: int, data_len: int, password: str = None):
+    # Descriptografa/descomprime o payload e reconstrói a imagem. A senha já
+    # vem resolvida pelo chamador, então esta parte pode rodar num worker.
+    with open(path, 'rb') as f:
+        f.seek(offset)
+
+        mm = None
+        mview = None
         if metadata.get("encrypted"):
-            password = simpledialog.askstring("Senha", "O arquivo .lamo está criptografado. Digite a senha:", show='*', parent=parent)
-            if not password:
-                raise ValueError("Operação cancelada. Senha necessária para descriptografar.")
-            
-            salt = urlsafe_b64decode(metadata.get("salt").encode('utf-8'))
-            
+            # as cifras precisam de bytes contíguos; lê direto para o heap
+            compressed = f.read(data_len)
+        else:
+            # mmap: o kernel pagina o arquivo sob demanda direto do page
+            # cache, sem copiar o payload inteiro para o heap
             try:
-                compressed = decrypt_data(compressed, password, salt)
-            except Exception as e:
-                raise ValueError(f"Falha na descriptografia. Senha incorreta ou arquivo corrompido: {e}")
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                mview = memoryview(mm)[offset:offset + data_len]
+                compressed = mview
+            except (ValueError, OSError):
+                compressed = f.read(data_len)
+
+        try:
+            # --- Descriptografia (se necessário) ---
+            if metadata.get("encrypted"):
+                if not password:
+                    raise ValueError("Operação cancelada. Senha necessária para descriptografar.")
+
+                salt = urlsafe_b64decode(metadata.get("salt").encode('utf-8'))
+                # v2 grava cipher=AESGCM + nonce nos metadados; sem eles é v1 (Fernet)
+                nonce = None
+                if metadata.get("cipher") == "AESGCM":
+                    nonce = urlsafe_b64decode(metadata.get("nonce").encode('utf-8'))
+
+                try:
+                    compressed = decrypt_data(compressed, password, salt, nonce)
+                except Exception as e:
+                    raise ValueError(f"Falha na descriptografia. Senha incorreta ou arquivo corrompido: {e}")
+
+            # VULN-01: Descompressão segura com limite de tamanho
+            png_bytes = None
+            if metadata.get("compression") == "none":
+                # v2: PNG gravado sem a camada zlib do container
+                png_bytes = bytes(compressed)
+            elif metadata.get("compression") == "zstd":
+                if _zstd is None:
+                    raise ValueError("Arquivo usa compressão zstd; instale o pacote 'zstandard'")
+                # o frame de streaming não embute o tamanho final, então o
+                # teto vai explícito — serve também de limite anti-bomba
+                png_bytes = _zstd.ZstdDecompressor().decompress(
+                    bytes(compressed), max_output_size=MAX_DECOMPRESSED_SIZE)
+            elif _libdeflate is not None:
+                # libdeflate impõe o teto de saída em C, sem loop Python
+                try:
+                    png_bytes = _libdeflate.zlib_decompress(compressed, MAX_DECOMPRESSED_SIZE)
+                except Exception:
+                    png_bytes = None  # stream não suportado; usa o caminho streaming
 
-        # VULN-01: Descompressão segura com limite de tamanho
-        dobj = zlib.decompressobj()
-        png_bytes = b''
-        decompressed_size = 0
+            if png_bytes is None:
+                # Usa max_length do decompressobj para descomprimir em blocos
+                # grandes direto do buffer de entrada — sem fatiar em pedaços de
+                # 1KB (que copiava tudo) nem concatenar bytes (que era O(N²))
+                dobj = zlib.decompressobj()
+                out = bytearray()
+                total = 0
+                data = compressed
 
-        # Descomprime em blocos para checar o tamanho total
-        # Nota: O tamanho do chunk é arbitrário, mas 1024 é um bom ponto de partida.
-        for chunk in [compressed[i:i + 1024] for i in range(0, len(compressed), 1024)]:
-            png_bytes += dobj.decompress(chunk)
-            decompressed_size = len(png_bytes)
-            if decompressed_size > MAX_DECOMPRESSED_SIZE:
-                raise ValueError('Tamanho de dados descompactados excedido (Compression Bomb)')
+                while data:
+                    piece = dobj.decompress(data, 1 << 20)
+                    total += len(piece)
+                    if total > MAX_DECOMPRESSED_SIZE:
+                        raise ValueError('Tamanho de dados descompactados excedido (Compression Bomb)')
+                    out.extend(piece)
+                    data = dobj.unconsumed_tail
 
-        png_bytes += dobj.flush()
+                tail = dobj.flush()
+                if tail:  # normalmente vazio em streams zlib; evita um extend à toa
+                    out.extend(tail)
+                if dobj.unused_data:
+                    # bytes após o fim do stream: payload malformado
+                    raise ValueError('Dados inesperados após o fim do stream zlib')
+                png_bytes = bytes(out)
+        finally:
+            if mview is not None:
+                mview.release()
+            if mm is not None:
+                mm.close()
+
+    # verificação de integridade ponta-a-ponta (quando o escritor gravou o
+    # CRC e o pacote 'crc32c' está disponível aqui)
+    if _crc32c is not None and metadata.get("crc32c") is not None:
+        if _crc32c.crc32c(png_bytes) != metadata["crc32c"]:
+            raise ValueError('Falha de integridade: CRC32C do payload não confere')
+
+    if metadata.get("storage") == "raw":
+        # v2: pixels crus — reconstruir é um memcpy via frombytes, sem
+        # passar pelo decodificador PNG
+        w, h = int(metadata["width"]), int(metadata["height"])
+        if w * h > ImageFile.MAX_IMAGE_PIXELS:
+            raise ValueError('Dimensões excedem o limite de pixels')
+        mode = metadata["mode"]
+        if metadata.get("layout") == "planar":
+            return _unplanar(mode, w, h, png_bytes)
+        return Image.frombytes(mode, (w, h), png_bytes)
 
     bio = BytesIO(png_bytes)
     # VULN-02: ImageFile.MAX_IMAGE_PIXELS já está configurado globalmente
     img = Image.open(bio)
-    img.load()
+    # decode preguiçoso: Image.open só lê o cabeçalho (dimensões/modo);
+    # os pixels são decodificados no primeiro acesso real — preview ou
+    # salvar. O BytesIO fica pendurado na imagem para o decoder ainda
+    # ter de onde ler quando isso acontecer.
+    img._source_bio = bio
     # Depois de reconstruir, define format para PNG (conteúdo interno)
     img.format = "PNG"
+    return img
+
+def _unplanar(mode: str, w: int, h: int, data: bytes) -> Image.Image:
+    # desfaz o layout planar: R|G|B(|A) contíguos -> pixels intercalados
+    bands = Image.getmodebands(mode)
+    if _np is not None:
+        arr = _np.frombuffer(data, _np.uint8).reshape(bands, -1).T.tobytes()
+        return Image.frombytes(mode, (w, h), arr)
+    plane = w * h
+    return Image.merge(mode, [Image.frombytes('L', (w, h), data[i * plane:(i + 1) * plane])
+                              for i in range(bands)])
+
+def read_lamo(path: str, parent=None):
+    metadata, offset, data_len = read_lamo_header(path)
+
+    password = None
+    if metadata.get("encrypted"):
+        password = simpledialog.askstring("Senha", "O arquivo .lamo está criptografado. Digite a senha:", show='*', parent=parent)
+        if not password:
+            raise ValueError("Operação cancelada. Senha necessária para descriptografar.")
+
+    img = read_lamo_payload(path, metadata, offset, data_len, password)
     return img, metadata
 
 # --- utilidades ---
-def convert_file_to_lamo(input_path: str, out_path: str = None, zlib_level: int = 9):
+def convert_file_to_lamo(input_path: str, out_path: str = None, zlib_level: int = 9, password: str = None):
     # VULN-05: Garantir que o caminho de saída não permita Path Traversal
     if not out_path:
         # Usa apenas o nome do arquivo de entrada para construir o nome de saída
@@ -183,11 +621,50 @@ def convert_file_to_lamo(input_path: str, out_path: str = None, zlib_level: int
 
     # VULN-02: ImageFile.MAX_IMAGE_PIXELS já está configurado globalmente
     img = Image.open(input_path)
+    meta = {"source": os.path.basename(input_path), "orig_format": getattr(img, "format", None)}
+
+    if (img.format or '').upper() == 'PNG':
+        # O arquivo de entrada já é um PNG válido: copia os bytes direto
+        # para o container, sem decodificar nem recodificar os pixels.
+        # Image.open sem .load() só lê o cabeçalho, então as dimensões
+        # saem de graça para os metadados.
+        meta.update({"width": img.width, "height": img.height, "mode": img.mode})
+        img.close()
+        with open(input_path, 'rb') as f:
+            png_bytes = f.read()
+        write_lamo_bytes(out_path, png_bytes, meta, password=password, zlib_level=zlib_level)
+        return out_path
+
     # garante carregamento (evita lazy load issues)
     img.load()
-    write_lamo(out_path, img, metadata={"source": os.path.basename(input_path), "orig_format": getattr(img, "format", None)}, zlib_level=zlib_level)
+    write_lamo(out_path, img, metadata=meta, password=password, zlib_level=zlib_level)
     return out_path
 
+def _pool_init(max_pixels):
+    # cada processo filho precisa reaplicar o limite global de pixels (VULN-02)
+    ImageFile.MAX_IMAGE_PIXELS = max_pixels
+
+def convert_many(paths, out_dir: str = None, workers: int = None, zlib_level: int = 9, password: str = None):
+    # Conversão em lote: cada arquivo é um pipeline independente
+    # (decode + encode + deflate), então escala quase linear com os núcleos.
+    # Processos em vez de threads: cada worker tem seu próprio espaço de
+    # endereçamento para os buffers intermediários grandes.
+    workers = workers or os.cpu_count()
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_pool_init,
+            initargs=(ImageFile.MAX_IMAGE_PIXELS,)) as ex:
+        futs = []
+        for p in paths:
+            out = None
+            if out_dir:
+                out = os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + ".lamo")
+            futs.append(ex.submit(convert_file_to_lamo, p, out, zlib_level, password))
+        for fut in futs:
+            results.append(fut.result())
+    return results
+
 def convert_png_to_lamo(png_path: str, out_path: str = None, zlib_level: int = 9):
     return convert_file_to_lamo(png_path, out_path, zlib_level)
 
@@ -235,11 +712,23 @@ class LamoApp(tk.Tk):
         self.tk_image = None           # ImageTk.PhotoImage
         self.current_meta = None
         self.current_path = None
+        self._current_array = None     # cache do np.asarray (ver current_array)
         self.password_var = tk.StringVar()
         self.encrypt_var = tk.BooleanVar()
         self.zlib_level_var = tk.IntVar(value=9) # Nível de compressão ZLIB (0-9)
+        # PBKDF2, deflate e o save do Pillow soltam o GIL — rodam em worker
+        # para não congelar o loop de eventos do Tk
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
         self.create_widgets()
 
+        # avisa se o Pillow não está linkado ao libjpeg-turbo (encode/decode
+        # de JPEG fica 2-6x mais lento sem ele; veja o README para reinstalar)
+        try:
+            if not features.check_feature('libjpeg_turbo'):
+                print('Aviso: Pillow sem libjpeg-turbo — JPEGs usarão o caminho lento')
+        except Exception:
+            pass  # versões antigas do Pillow não expõem essa feature
+
     def create_widgets(self):
         # Frames
         top = ttk.Frame(self, padding=8)
@@ -328,8 +817,8 @@ class LamoApp(tk.Tk):
         if not path:
             return
         try:
-            # VULN-01, VULN-02, VULN-03: read_lamo já está corrigido
-            img, meta = read_lamo(path, parent=self)
+            # só o cabeçalho: valida e mostra a metadata na hora
+            meta, offset, data_len = read_lamo_header(path)
         except Exception as e:
             # VULN-04: Tratamento de erro seguro
             print(f"Erro ao ler .lamo: {e}") # Log interno para debug
@@ -338,6 +827,40 @@ class LamoApp(tk.Tk):
         # marca que veio de um .lamo
         meta = meta or {}
         meta.setdefault("source_lamo", os.path.basename(path))
+
+        # a senha é resolvida aqui (diálogo precisa da thread principal);
+        # o decode pesado do payload vai para o worker
+        password = None
+        if meta.get("encrypted"):
+            password = simpledialog.askstring("Senha", "O arquivo .lamo está criptografado. Digite a senha:", show='*', parent=self)
+            if not password:
+                return
+
+        self.current_meta = meta
+        self.meta_text.config(state=tk.NORMAL)
+        self.meta_text.delete("1.0", tk.END)
+        self.meta_text.insert(tk.END, json.dumps(meta, indent=2, ensure_ascii=False))
+        self.path_var.set(f"{path} (carregando...)")
+
+        # miniatura embutida: preview na hora, enquanto o payload cheio
+        # decodifica no worker
+        thumb = read_lamo_thumb(path, meta, offset, data_len)
+        if thumb is not None:
+            self.tk_image = ImageTk.PhotoImage(thumb)
+            self.preview_label.configure(image=self.tk_image)
+
+        fut = self._pool.submit(read_lamo_payload, path, meta, offset, data_len, password)
+        fut.add_done_callback(lambda f: self.after(0, self._on_lamo_done, f, path, meta))
+
+    def _on_lamo_done(self, fut, path, meta):
+        try:
+            img = fut.result()
+        except Exception as e:
+            # VULN-04: Tratamento de erro seguro
+            print(f"Erro ao ler .lamo: {e}") # Log interno para debug
+            messagebox.showerror("Erro", "Falha ao ler .lamo. O arquivo pode estar corrompido ou ser malicioso.")
+            self.path_var.set(self.current_path or "Nenhum arquivo carregado")
+            return
         self.set_image(img, meta)
         self.current_path = path
         self.path_var.set(path)
@@ -363,14 +886,28 @@ class LamoApp(tk.Tk):
                 return
             
             zlib_level = self.zlib_level_var.get()
-            
-            # write_lamo já tem checagem de tamanho de metadados
-            write_lamo(out, self.current_image, metadata=meta, password=password, zlib_level=zlib_level)
+
+            # roda o PBKDF2 + compressão no worker; o resultado volta pela
+            # thread principal via self.after
+            self.path_var.set("Salvando...")
+            fut = self._pool.submit(write_lamo, out, self.current_image,
+                                    meta, password, zlib_level)
+            fut.add_done_callback(lambda f: self.after(0, self._on_write_done, f, out))
         except Exception as e:
             # VULN-04: Tratamento de erro seguro
             print(f"Erro ao escrever .lamo: {e}") # Log interno para debug
             messagebox.showerror("Erro", "Falha ao escrever .lamo. Verifique as permissões ou o espaço em disco.")
             return
+
+    def _on_write_done(self, fut, out):
+        try:
+            fut.result()
+        except Exception as e:
+            # VULN-04: Tratamento de erro seguro
+            print(f"Erro ao escrever .lamo: {e}") # Log interno para debug
+            messagebox.showerror("Erro", "Falha ao escrever .lamo. Verifique as permissões ou o espaço em disco.")
+            self.path_var.set(self.current_path or "Nenhum arquivo carregado")
+            return
         messagebox.showinfo("Pronto", f"Arquivo salvo: {out}")
         self.current_path = out
         self.path_var.set(out)
@@ -382,8 +919,25 @@ class LamoApp(tk.Tk):
         out = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG", "*.png")], title="Salvar PNG reconstruído", initialfile="reconstruido.png")
         if not out:
             return
+        src = getattr(self.current_image, "_source_bio", None)
+        if src is not None and self.current_image.format == "PNG":
+            # a imagem veio de um .lamo com payload PNG e não é editável
+            # aqui: os bytes prontos vão direto para o disco, sem pagar o
+            # re-encode (de longe a parte mais cara do salvar)
+            fut = self._pool.submit(self._write_bytes, out, src.getbuffer())
+        else:
+            # o encode PNG do Pillow solta o GIL; roda no worker
+            fut = self._pool.submit(self.current_image.save, out, format="PNG")
+        fut.add_done_callback(lambda f: self.after(0, self._on_png_done, f, out))
+
+    @staticmethod
+    def _write_bytes(path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def _on_png_done(self, fut, out):
         try:
-            self.current_image.save(out, format="PNG")
+            fut.result()
         except Exception as e:
             # VULN-04: Tratamento de erro seguro
             print(f"Erro ao salvar PNG: {e}") # Log interno para debug
@@ -391,16 +945,45 @@ class LamoApp(tk.Tk):
             return
         messagebox.showinfo("Pronto", f"PNG salvo: {out}")
 
+    @property
+    def current_array(self):
+        # Vista numpy dos pixels para operações vetorizadas (histograma,
+        # checksum etc.). Calculada sob demanda e cacheada: np.asarray força
+        # o decode, e materializar aqui anularia o load preguiçoso do
+        # read_lamo_payload. None sem numpy ou sem imagem carregada.
+        if self._current_array is None and _np is not None and self.current_image is not None:
+            self._current_array = _np.asarray(self.current_image)
+        return self._current_array
+
+    def _planes(self):
+        # canais como fatias contíguas (SoA) do array cacheado; ops por
+        # canal rodam em velocidade de memória em vez de loop Python
+        a = self.current_array
+        if a is None or a.ndim < 3:
+            return None
+        return tuple(a[..., i] for i in range(a.shape[2]))
+
     def set_image(self, pil_image: Image.Image, metadata: dict):
         # salva PIL
         self.current_image = pil_image
         self.current_meta = metadata or {}
+        self._current_array = None  # invalida a vista numpy da imagem anterior
 
-        # cria thumbnail para preview
-        preview = pil_image.copy()
-        preview.thumbnail((700, 500), Image.LANCZOS)
-        self.tk_image = ImageTk.PhotoImage(preview)
-        self.preview_label.configure(image=self.tk_image)
+        # cria thumbnail para preview (cacheado na própria imagem: voltar a
+        # ela não paga o LANCZOS de novo, e o preview morre junto com ela —
+        # um dict por id() guardava entradas de imagens já coletadas, e um
+        # endereço reciclado entregava o preview de outra imagem)
+        ph = getattr(pil_image, "_preview_photo", None)
+        if ph is not None:
+            self.tk_image = ph
+            self.preview_label.configure(image=self.tk_image)
+        else:
+            # o LANCZOS roda no worker para não travar a UI; o PhotoImage
+            # precisa nascer na thread do Tk, então o resultado volta via
+            # self.after (o preview atual — p.ex. a miniatura embutida —
+            # fica na tela enquanto isso)
+            fut = self._pool.submit(self._make_preview, pil_image)
+            fut.add_done_callback(lambda f: self.after(0, self._on_preview_done, f, pil_image))
 
         # mostra metadata formatada
         self.meta_text.config(state=tk.NORMAL)
@@ -408,10 +991,38 @@ class LamoApp(tk.Tk):
         self.meta_text.delete("1.0", tk.END)
         self.meta_text.insert(tk.END, pretty)
 
+    @staticmethod
+    def _make_preview(pil_image: Image.Image) -> Image.Image:
+        # resize direto no tamanho-alvo: aloca só o buffer do preview, em
+        # vez do copy() da imagem cheia (256MB num RGBA 8k) que o
+        # thumbnail in-place exigia
+        w, h = pil_image.size
+        r = min(700 / w, 500 / h)
+        if r >= 1:
+            return pil_image  # já cabe no preview; nada a redimensionar
+        # reducing_gap faz um pré-reduce BOX barato antes do LANCZOS,
+        # que então toca uma fração dos pixels da imagem cheia
+        return pil_image.resize((max(1, int(w * r)), max(1, int(h * r))),
+                                Image.LANCZOS, reducing_gap=3.0)
+
+    def _on_preview_done(self, fut, pil_image):
+        try:
+            preview = fut.result()
+        except Exception as e:
+            print(f"Erro ao gerar preview: {e}") # Log interno para debug
+            return
+        if pil_image is not self.current_image:
+            return  # o usuário já trocou de imagem; preview obsoleto
+        ph = ImageTk.PhotoImage(preview)
+        pil_image._preview_photo = ph
+        self.tk_image = ph
+        self.preview_label.configure(image=self.tk_image)
+
     def clear(self):
         self.current_image = None
         self.current_meta = None
         self.tk_image = None
+        self._current_array = None
         self.preview_label.configure(image='')
         self.meta_text.config(state=tk.NORMAL)
         self.meta_text.delete("1.0", tk.END)
@@ -420,7 +1031,34 @@ class LamoApp(tk.Tk):
         self.current_path = None
 
 # --- main ---
+_BATCH_EXTS = ('.png', '.jpg', '.jpeg', '.webp')
+
+def _batch_paths(args):
+    # expande argumentos: arquivos entram direto, pastas são varridas
+    # (sem recursão) atrás de imagens suportadas
+    paths = []
+    for a in args:
+        if os.path.isdir(a):
+            for name in sorted(os.listdir(a)):
+                if name.lower().endswith(_BATCH_EXTS):
+                    paths.append(os.path.join(a, name))
+        else:
+            paths.append(a)
+    return paths
+
 def main():
+    # modo batch: `python conversor.py foto.png pasta/ ...` converte tudo em
+    # paralelo (um processo por núcleo) sem nem subir o Tk
+    if len(sys.argv) > 1:
+        paths = _batch_paths(sys.argv[1:])
+        if not paths:
+            print("Nenhuma imagem encontrada nos caminhos informados.")
+            return
+        for out in convert_many(paths):
+            print(out)
+        print(f"{len(paths)} arquivo(s) convertido(s).")
+        return
+
     app = LamoApp()
     app.mainloop()
 